@@ -1,59 +1,166 @@
+import functools
+import importlib
+import json
 import logging
+import os
 import time
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
 
-import dash
-import duckdb
-import folium
-import pandas as pd
-import plotly.express as px
-from dash import Input, Output, dcc, html
-from folium.plugins import FastMarkerCluster
+MODULE_LOAD_STARTED_AT = time.perf_counter()
+
+import dash  # noqa: E402
+import duckdb  # noqa: E402
+from dash import Input, Output, dcc, html  # noqa: E402
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     level=logging.INFO,
 )
 
-
-# Function to load data from DuckDB
-def load_data():
+DATABASE_PATH = Path("data.duckdb")
+# Снимок метаданных для построения layout без обращения к DuckDB при старте
+LAYOUT_SNAPSHOT_PATH = Path("layout_metadata.json")
+
+# DASHBOARD_FAST_STARTUP=1 - layout строится из снимка метаданных, DuckDB открывается при первом запросе
+FAST_STARTUP = os.getenv("DASHBOARD_FAST_STARTUP", "0") == "1"
+# DASHBOARD_PROFILE_STARTUP=1 - логируем время импорта и инициализации каждого компонента
+PROFILE_STARTUP = os.getenv("DASHBOARD_PROFILE_STARTUP", "0") == "1"
+
+FILTER_COLUMNS = ["type_user", "category_name", "type_of_payment"]
+ORDERS_COLUMNS = ["type_user", "category_name", "ship_date",
+                  "price_of_order", "type_of_payment",
+                  "latitude", "longitude"]
+DEFAULT_LAYOUT_METADATA = {
+    "type_user": [],
+    "category_name": [],
+    "type_of_payment": [],
+    "min_ship_date": "2020-01-01",
+    "max_ship_date": "2025-12-31",
+}
+
+# Время (в секундах) каждого этапа старта, заполняется при DASHBOARD_PROFILE_STARTUP=1
+startup_timings = {}
+
+
+@contextmanager
+def profile_step(component):
+    started_at = time.perf_counter()
     try:
-        # Initialize DuckDB connection
-        conn = duckdb.connect(database="data.duckdb", read_only=True)
+        yield
+    finally:
+        if PROFILE_STARTUP:
+            elapsed = time.perf_counter() - started_at
+            startup_timings[component] = elapsed
+            logging.info(f"[startup] {component}: {elapsed * 1000:.1f} мс")
+
+
+if PROFILE_STARTUP:
+    startup_timings["import dash, duckdb"] = time.perf_counter() - MODULE_LOAD_STARTED_AT
+    logging.info(f"[startup] import dash, duckdb: {startup_timings['import dash, duckdb'] * 1000:.1f} мс")
+
+
+# Тяжелые библиотеки (pandas, plotly, folium) импортируются при первом использовании
+@functools.cache
+def load_module(module_name):
+    with profile_step(f"import {module_name}"):
+        return importlib.import_module(module_name)
+
+
+def empty_orders_df():
+    pd = load_module("pandas")
+    return pd.DataFrame(columns=ORDERS_COLUMNS)
 
-        # Get data into pandas DataFrame for initial setup
-        df = conn.execute("SELECT * FROM orders").df()
 
-        count_orders = conn.sql("SELECT count(*) FROM orders").fetchone()[0]
+# Function to open DuckDB connection (once per process)
+@functools.cache
+def get_connection():
+    with profile_step("connect duckdb"):
+        try:
+            conn = duckdb.connect(database=str(DATABASE_PATH), read_only=True)
 
-        logging.info(f"Loaded {count_orders} orders from the database.")
+            count_orders = conn.sql("SELECT count(*) FROM orders").fetchone()[0]
 
-        return conn, df
+            logging.info(f"Loaded {count_orders} orders from the database.")
+
+            return conn
+        except Exception as e:
+            print(f"Error loading data: {e}")
+            # Return an empty connection if file doesn't exist
+            return duckdb.connect(database=":memory:", read_only=False)
+
+
+# Function to collect filter values and date range for the layout
+def collect_layout_metadata(conn):
+    try:
+        metadata = {
+            column: [row[0] for row in conn.execute(f"SELECT DISTINCT {column} FROM orders").fetchall()]
+            for column in FILTER_COLUMNS
+        }
+        min_ship_date, max_ship_date = conn.execute("SELECT MIN(ship_date), MAX(ship_date) FROM orders").fetchone()
     except Exception as e:
-        print(f"Error loading data: {e}")
-        # Return an empty connection and DataFrame with expected columns if file doesn't exist
-        conn = duckdb.connect(database=":memory:", read_only=False)
-        df = pd.DataFrame(columns=["type_user", "category_name", "ship_date",
-                                   "price_of_order", "type_of_payment",
-                                   "latitude", "longitude"])
-        return conn, df
+        print(f"Error loading layout metadata: {e}")
+        return dict(DEFAULT_LAYOUT_METADATA)
+
+    if min_ship_date is None or max_ship_date is None:
+        return dict(DEFAULT_LAYOUT_METADATA)
+
+    metadata["min_ship_date"] = min_ship_date.isoformat() if isinstance(min_ship_date, date) else str(min_ship_date)
+    metadata["max_ship_date"] = max_ship_date.isoformat() if isinstance(max_ship_date, date) else str(max_ship_date)
+    return metadata
+
+
+def is_snapshot_fresh():
+    if not LAYOUT_SNAPSHOT_PATH.exists():
+        return False
+    if not DATABASE_PATH.exists():
+        return True
+    return LAYOUT_SNAPSHOT_PATH.stat().st_mtime >= DATABASE_PATH.stat().st_mtime
+
+
+# Function to load layout metadata from snapshot or from DuckDB
+def load_layout_metadata():
+    if FAST_STARTUP and is_snapshot_fresh():
+        try:
+            with profile_step("read layout snapshot"):
+                return json.loads(LAYOUT_SNAPSHOT_PATH.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"Error reading layout snapshot: {e}")
+
+    conn = get_connection()
+    with profile_step("query layout metadata"):
+        metadata = collect_layout_metadata(conn)
+
+    # Пустую витрину не кешируем, чтобы не зафиксировать значения по умолчанию
+    if FAST_STARTUP and DATABASE_PATH.exists() and metadata != DEFAULT_LAYOUT_METADATA:
+        try:
+            LAYOUT_SNAPSHOT_PATH.write_text(json.dumps(metadata, ensure_ascii=False), encoding="utf-8")
+        except OSError as e:
+            print(f"Error writing layout snapshot: {e}")
+
+    return metadata
 
 
 # Initialize the app
-app = dash.Dash(
-    __name__,
-    # Include Google Font 'Poppins' for modern typography
-    external_stylesheets=[
-        "https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600&display=swap",
-    ],
-)
+with profile_step("init dash app"):
+    app = dash.Dash(
+        __name__,
+        # Include Google Font 'Poppins' for modern typography
+        external_stylesheets=[
+            "https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600&display=swap",
+        ],
+    )
 
 # Set the page title
 app.title = "Интерактивная Карта"
 
-# Load the data
-conn, df = load_data()
+# In the default mode DuckDB is opened eagerly, as before
+if not FAST_STARTUP:
+    get_connection()
+
+# Load the layout metadata
+layout_metadata = load_layout_metadata()
 
 # Initialize the app layout with modern styling
 app.layout = html.Div([
@@ -67,8 +174,7 @@ app.layout = html.Div([
                 html.Div([
                     dcc.Dropdown(
                         id="type-user-dropdown",
-                        options=[{"label": row[0], "value": row[0]} for row in
-                                 conn.execute("SELECT DISTINCT type_user FROM orders").fetchall()] if "type_user" in df.columns and len(df) > 0 else [],
+                        options=[{"label": value, "value": value} for value in layout_metadata["type_user"]],
                         multi=True,
                         placeholder="Тип пользователя",
                     ),
@@ -78,8 +184,7 @@ app.layout = html.Div([
                 html.Div([
                     dcc.Dropdown(
                         id="category-dropdown",
-                        options=[{"label": row[0], "value": row[0]} for row in
-                                 conn.execute("SELECT DISTINCT category_name FROM orders").fetchall()] if "category_name" in df.columns and len(df) > 0 else [],
+                        options=[{"label": value, "value": value} for value in layout_metadata["category_name"]],
                         multi=True,
                         placeholder="Категория",
                     ),
@@ -89,10 +194,10 @@ app.layout = html.Div([
                 html.Div([
                     dcc.DatePickerRange(
                         id="date-range",
-                        min_date_allowed=conn.execute("SELECT MIN(ship_date) FROM orders").fetchone()[0] if "ship_date" in df.columns and len(df) > 0 else datetime(2020, 1, 1),
-                        max_date_allowed=conn.execute("SELECT MAX(ship_date) FROM orders").fetchone()[0] if "ship_date" in df.columns and len(df) > 0 else datetime(2025, 12, 31),
-                        start_date=conn.execute("SELECT MIN(ship_date) FROM orders").fetchone()[0] if "ship_date" in df.columns and len(df) > 0 else datetime(2020, 1, 1),
-                        end_date=conn.execute("SELECT MAX(ship_date) FROM orders").fetchone()[0] if "ship_date" in df.columns and len(df) > 0 else datetime(2025, 12, 31),
+                        min_date_allowed=layout_metadata["min_ship_date"],
+                        max_date_allowed=layout_metadata["max_ship_date"],
+                        start_date=layout_metadata["min_ship_date"],
+                        end_date=layout_metadata["max_ship_date"],
                         display_format="YYYY-MM-DD",
                         first_day_of_week=1,
                         start_date_placeholder_text="Начальная дата",
@@ -105,8 +210,7 @@ app.layout = html.Div([
                 html.Div([
                     dcc.Dropdown(
                         id="payment-dropdown",
-                        options=[{"label": row[0], "value": row[0]} for row in
-                                 conn.execute("SELECT DISTINCT type_of_payment FROM orders").fetchall()] if "type_of_payment" in df.columns and len(df) > 0 else [],
+                        options=[{"label": value, "value": value} for value in layout_metadata["type_of_payment"]],
                         multi=True,
                         placeholder="Способ оплаты",
                     ),
@@ -139,6 +243,17 @@ app.layout = html.Div([
     ], className="container"),
 ], style={"backgroundColor": "var(--background-color)"})
 
+if PROFILE_STARTUP:
+    logging.info(f"[startup] module load total: {(time.perf_counter() - MODULE_LOAD_STARTED_AT) * 1000:.1f} мс")
+
+    # Время от начала загрузки модуля до первого HTTP-запроса к приложению
+    @app.server.before_request
+    def report_time_to_first_request():
+        if "first request" in startup_timings:
+            return
+        startup_timings["first request"] = time.perf_counter() - MODULE_LOAD_STARTED_AT
+        logging.info(f"[startup] time to first request: {startup_timings['first request'] * 1000:.1f} мс")
+
 
 # Callback to update the map based on filters
 @app.callback(
@@ -175,12 +290,10 @@ def update_map(selected_users, selected_categories, start_date, end_date, select
 
     # Execute the query and get the filtered data
     try:
-        filtered_df = conn.execute(sql_query).fetchdf()
+        filtered_df = get_connection().execute(sql_query).fetchdf()
     except Exception as e:
         print(f"SQL Error: {e}")
-        filtered_df = pd.DataFrame(columns=["type_user", "category_name", "ship_date",
-                                            "price_of_order", "type_of_payment",
-                                            "latitude", "longitude"])
+        filtered_df = empty_orders_df()
 
     logging.info(f"Query: {sql_query}")
     # Log the number of records returned
@@ -189,6 +302,7 @@ def update_map(selected_users, selected_categories, start_date, end_date, select
     # Check if we have data with coordinates
     if len(filtered_df) == 0 or "latitude" not in filtered_df.columns or "longitude" not in filtered_df.columns:
         # Return an empty map centered on a default location if no data
+        px = load_module("plotly.express")
         empty_fig = px.scatter_mapbox(
             lat=[52.260853], lon=[104.282274],
             zoom=12, height=800,
@@ -210,6 +324,9 @@ def update_map(selected_users, selected_categories, start_date, end_date, select
     # Для кластеров используем folium
     if map_type == "clusters":
         # Создаем карту folium
+        folium = load_module("folium")
+        fast_marker_cluster = load_module("folium.plugins").FastMarkerCluster
+
         center_lat = filtered_df["latitude"].mean()
         center_lon = filtered_df["longitude"].mean()
 
@@ -245,7 +362,7 @@ def update_map(selected_users, selected_categories, start_date, end_date, select
         # Подготовка данных для кластеризации без сэмплирования
         cluster_data = filtered_df[["latitude", "longitude", "type_user"]].values.tolist()
 
-        FastMarkerCluster(data=cluster_data, callback=callback).add_to(m)
+        fast_marker_cluster(data=cluster_data, callback=callback).add_to(m)
 
         # Конвертируем карту в HTML и отображаем в iframe
         html_string = m._repr_html_()
@@ -255,6 +372,8 @@ def update_map(selected_users, selected_categories, start_date, end_date, select
         return html.Iframe(srcDoc=html_string, style={"width": "100%", "height": "800px", "border": "none"})
 
     # Для остальных типов карт используем Plotly
+    px = load_module("plotly.express")
+
     # Format price for hover data
     if "price_of_order" in filtered_df.columns:
         filtered_df["price_formatted"] = filtered_df["price_of_order"].apply(lambda x: f"₽{x:,}".replace(",", " "))